@@ -88,7 +88,7 @@ create_venv() {
   blu "Creating Python venv…"
   python3 -m venv "${VENV_DIR}"
   "${VENV_DIR}/bin/pip" install --upgrade pip
-  "${VENV_DIR}/bin/pip" install flask requests python-dotenv
+  "${VENV_DIR}/bin/pip" install flask requests python-dotenv gevent orjson
 }
 
 download_app() {
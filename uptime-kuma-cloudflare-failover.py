@@ -14,33 +14,49 @@ Features
 - CSRF token on mutating routes
 
 Deps
-  pip install flask requests python-dotenv
+  pip install flask requests python-dotenv gevent orjson
 """
 from __future__ import annotations
 
+# gevent must patch the stdlib before anything else imports socket/ssl so
+# outbound HTTP (Cloudflare/Telegram) yields to other webhook handlers
+# instead of blocking the whole server. Optional: without gevent we fall
+# back to the threaded dev server below.
+try:
+    from gevent import monkey
+    monkey.patch_all()
+    _HAS_GEVENT = True
+except ImportError:
+    _HAS_GEVENT = False
+
+import atexit
 import datetime as dt
 import json
 import logging
+import logging.handlers
 import os
+import queue
 import secrets
+import signal
+import socket
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, asdict
 from functools import wraps
 from typing import Dict, List, Optional
-from types import SimpleNamespace
 
 import requests
+from requests.adapters import HTTPAdapter, Retry
 from flask import (
     Flask,
     Response,
     abort,
-    jsonify,
-    render_template_string,
     request,
     session,
     url_for,
 )
+from flask.json.provider import DefaultJSONProvider
 from jinja2 import DictLoader
 
 # -------------------------
@@ -52,6 +68,26 @@ try:
 except Exception:
     pass
 
+# -------------------------
+# JSON codec (orjson if available)
+# -------------------------
+# orjson's C encoder is several times faster than stdlib json; keep it
+# optional with a stdlib fallback, like dotenv above.
+try:
+    import orjson
+
+    def _json_dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+
+    def _json_loads(data):
+        return orjson.loads(data)
+except ImportError:
+    def _json_dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+    def _json_loads(data):
+        return json.loads(data)
+
 # -------------------------
 # Configuration & Defaults
 # -------------------------
@@ -66,25 +102,152 @@ PORT = int(os.getenv("PORT", "5000"))
 LOG_FILE = os.getenv("LOG_FILE", "./failover.log")
 STATE_FILE = os.getenv("STATE_FILE", "./failover-state.json")
 TTL_DEFAULT = int(os.getenv("TTL", "60"))
+CF_USE_BATCH = os.getenv("CF_USE_BATCH", "true").lower() in {"1", "true", "yes", "on"}
+CF_REFRESH_SEC = int(os.getenv("CF_REFRESH_SEC", "300"))
+# Patches per batch POST; Cloudflare caps batches at 200 on free zones
+# (3500 on paid).
+CF_BATCH_CHUNK = int(os.getenv("CF_BATCH_CHUNK", "200"))
 SECRET_KEY = os.getenv("SECRET_KEY") or secrets.token_hex(16)
 ADMIN_USER = os.getenv("ADMIN_USER")
 ADMIN_PASS = os.getenv("ADMIN_PASS")
 
 CLOUDFLARE_API_BASE = f"https://api.cloudflare.com/client/v4/zones/{CLOUDFLARE_ZONE_ID}"
 
+# -------------------------
+# Outbound HTTP sessions
+# -------------------------
+# One keep-alive session per upstream so back-to-back calls (e.g. the N record
+# PUTs during a failover) reuse a pooled TLS connection instead of paying a
+# fresh handshake each time.
+# Short (connect, read) timeout for every outbound call so a stalled upstream
+# can never wedge a webhook handler; transient 5xx are retried with backoff.
+HTTP_TIMEOUT = (2, 5)
+_RETRY = Retry(
+    total=2,
+    backoff_factor=0.3,
+    status_forcelist=[429, 502, 503, 504],
+    allowed_methods=["GET", "PUT", "POST"],
+)
+
+CF_SESSION = requests.Session()
+CF_SESSION.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=10, max_retries=_RETRY))
+CF_SESSION.headers.update({
+    "Authorization": f"Bearer {CLOUDFLARE_API_TOKEN}",
+    "Content-Type": "application/json",
+})
+
+TG_SESSION = requests.Session()
+TG_SESSION.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=_RETRY))
+
+# Plain session (no auth header) for the DoH diagnostics probes.
+DOH_SESSION = requests.Session()
+DOH_SESSION.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=_RETRY))
+
+# Worker pool for the independent per-record DNS PUTs during a failover.
+DNS_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="dns")
+
+# Automatic (webhook-driven) switches run on a dedicated single worker so the
+# heartbeat response never waits on Cloudflare I/O and back-to-back switches
+# apply in submission order. Manual UI switches stay synchronous.
+DNS_UPDATE_POOL = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dns-update")
+
+# -------------------------
+# In-process resolver cache
+# -------------------------
+# A cold or slow resolver adds 20-200ms per outbound call; memoize
+# getaddrinfo for the few upstream hosts we talk to. We wrap whatever
+# getaddrinfo is installed at import time, so this composes with gevent's
+# monkey-patched sockets. Other hostnames are untouched.
+_GAI_HOSTS = {"api.cloudflare.com", "api.telegram.org", "cloudflare-dns.com"}
+_GAI_TTL = float(os.getenv("DNS_CACHE_TTL", "900"))
+_gai_cache: Dict = {}
+_gai_lock = threading.Lock()
+_real_getaddrinfo = socket.getaddrinfo
+
+
+def _cached_getaddrinfo(host, port, *args, **kwargs):
+    if host not in _GAI_HOSTS:
+        return _real_getaddrinfo(host, port, *args, **kwargs)
+    key = (host, port, args, tuple(sorted(kwargs.items())))
+    now = time.monotonic()
+    with _gai_lock:
+        entry = _gai_cache.get(key)
+        if entry and entry[1] > now:
+            return entry[0]
+    try:
+        value = _real_getaddrinfo(host, port, *args, **kwargs)
+    except OSError:
+        # Serve stale: a failover must not die because the local resolver
+        # is having a bad moment — these API endpoints are stable anycast.
+        if entry:
+            logger.warning("Resolver failed for %s; serving stale cached addresses", host)
+            return entry[0]
+        raise
+    with _gai_lock:
+        _gai_cache[key] = (value, now + _GAI_TTL)
+    return value
+
+
+socket.getaddrinfo = _cached_getaddrinfo
+
 # -------------
 # Logging setup
 # -------------
+class _SSEFanoutHandler(logging.Handler):
+    """Pushes each formatted log line to every subscribed SSE client queue.
+
+    Lives behind the QueueListener, so fan-out happens off the request
+    path; slow clients get lines dropped instead of blocking the listener.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._subscribers: set = set()
+        self._sub_lock = threading.Lock()
+
+    def subscribe(self) -> "queue.Queue[str]":
+        q: "queue.Queue[str]" = queue.Queue(maxsize=1000)
+        with self._sub_lock:
+            self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q: "queue.Queue[str]") -> None:
+        with self._sub_lock:
+            self._subscribers.discard(q)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        line = self.format(record)
+        with self._sub_lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(line)
+            except queue.Full:
+                pass
+
+
+# Handlers hang off a QueueListener on a background thread, so request
+# handlers only pay an in-memory enqueue per log line instead of a disk write.
 logger = logging.getLogger("failover")
 logger.setLevel(logging.INFO)
 fmt = logging.Formatter("[%(asctime)s] %(levelname)s: %(message)s")
 sh = logging.StreamHandler()
 sh.setFormatter(fmt)
-logger.addHandler(sh)
+_log_handlers: List[logging.Handler] = [sh]
 if LOG_FILE:
     fh = logging.FileHandler(LOG_FILE)
     fh.setFormatter(fmt)
-    logger.addHandler(fh)
+    _log_handlers.append(fh)
+_sse_handler = _SSEFanoutHandler()
+_sse_handler.setFormatter(fmt)
+_log_handlers.append(_sse_handler)
+_log_queue: "queue.Queue" = queue.Queue(-1)
+logger.addHandler(logging.handlers.QueueHandler(_log_queue))
+_log_listener = logging.handlers.QueueListener(
+    _log_queue, *_log_handlers, respect_handler_level=True
+)
+_log_listener.start()
+atexit.register(_log_listener.stop)
 
 # ---------------
 # Shared app state
@@ -97,6 +260,7 @@ class ServiceState:
     server2_up: bool = True
     current_dns: str = SERVER1_IP
     last_switch_at: Optional[str] = None  # ISO8601
+    _last_switch_epoch: float = 0.0  # same moment as epoch seconds, for cooldown math
     freeze: bool = False
     ttl: int = TTL_DEFAULT
     webhook_secret: Optional[str] = None
@@ -109,11 +273,53 @@ class ServiceState:
     _s2_down_streak: int = 0
     _s2_up_streak: int = 0
 
+    def decide(self) -> str:
+        """Advance the hysteresis streaks and return the desired DNS target.
+
+        Caller must hold state_lock; all reads/writes stay inside the one
+        critical section so concurrent webhooks can't see a torn decision.
+        """
+        if self.server1_up:
+            self._s1_up_streak += 1
+            self._s1_down_streak = 0
+        else:
+            self._s1_down_streak += 1
+            self._s1_up_streak = 0
+        if self.server2_up:
+            self._s2_up_streak += 1
+            self._s2_down_streak = 0
+        else:
+            self._s2_down_streak += 1
+            self._s2_up_streak = 0
+
+        if self.server1_up and (self.up_threshold <= 1 or self._s1_up_streak >= self.up_threshold):
+            return SERVER1_IP
+        if (
+            not self.server1_up
+            and self.server2_up
+            and (self.up_threshold <= 1 or self._s2_up_streak >= self.up_threshold)
+        ):
+            return SERVER2_IP
+        return self.current_dns
+
+    # Externally visible fields, i.e. everything except the streak counters.
+    # Enumerated explicitly so to_public is a flat getattr loop — asdict()
+    # deep-copies every field, which is pure overhead for primitives.
+    _PUBLIC_FIELDS = (
+        "server1_up",
+        "server2_up",
+        "current_dns",
+        "last_switch_at",
+        "freeze",
+        "ttl",
+        "webhook_secret",
+        "down_threshold",
+        "up_threshold",
+        "cooldown_seconds",
+    )
+
     def to_public(self):
-        d = asdict(self)
-        for k in list(d.keys()):
-            if k.startswith("_s"):
-                d.pop(k, None)
+        d = {k: getattr(self, k) for k in self._PUBLIC_FIELDS}
         if d.get("webhook_secret"):
             d["webhook_secret"] = "***"
         return d
@@ -121,11 +327,19 @@ class ServiceState:
     @classmethod
     def load(cls, path: str) -> "ServiceState":
         try:
-            with open(path, "r", encoding="utf-8") as f:
-                data = json.load(f)
+            with open(path, "rb") as f:
+                data = _json_loads(f.read())
             obj = cls(**{**asdict(cls()), **data})
             if not obj.webhook_secret:
                 obj.webhook_secret = secrets.token_urlsafe(24)
+            if obj.last_switch_at and not obj._last_switch_epoch:
+                # State written before the epoch field existed.
+                try:
+                    obj._last_switch_epoch = dt.datetime.fromisoformat(
+                        obj.last_switch_at.replace("Z", "+00:00")
+                    ).timestamp()
+                except Exception:
+                    pass
             return obj
         except FileNotFoundError:
             obj = cls()
@@ -138,26 +352,88 @@ class ServiceState:
             return obj
 
     def save(self, path: str) -> None:
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(asdict(self), f, indent=2)
+        # Single write + rename so a crash mid-save can never leave a torn
+        # state file behind. The file is machine-read only, so no indent.
+        data = _json_dumps(asdict(self))
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
 
 app_state = ServiceState.load(STATE_FILE)
 
+# Coalesced state persistence: hot-path callers just flip a dirty flag and a
+# single flusher thread turns any burst of changes into one disk write.
+_state_dirty = threading.Event()
+
+
+def _flush_state() -> None:
+    if not _state_dirty.is_set():
+        return
+    _state_dirty.clear()
+    with state_lock:
+        app_state.save(STATE_FILE)
+
+
+def schedule_save() -> None:
+    _state_dirty.set()
+
+
+def _state_flush_loop() -> None:
+    while True:
+        _state_dirty.wait()
+        time.sleep(0.1)  # short window so a burst lands in one write
+        _flush_state()
+
+
+threading.Thread(target=_state_flush_loop, daemon=True, name="state-flush").start()
+atexit.register(_flush_state)
+
+
+def _handle_sigterm(signum, frame):
+    # systemd stops us with SIGTERM; flush pending state, then exit through
+    # the normal atexit path.
+    _flush_state()
+    raise SystemExit(0)
+
+
+signal.signal(signal.SIGTERM, _handle_sigterm)
+
+# Generation counter for cached derived views (e.g. the serialized
+# /api/status body): bump it on any externally visible state or record
+# change so stale render caches get rebuilt lazily. Alongside it we publish
+# an immutable snapshot dict by plain reference assignment (atomic in
+# CPython), so read-mostly endpoints never need to touch state_lock.
+_state_gen = 0
+CURRENT_SNAPSHOT: Dict = app_state.to_public()
+
+
+def _mark_state_changed() -> None:
+    global _state_gen, CURRENT_SNAPSHOT
+    _state_gen += 1
+    with state_lock:
+        CURRENT_SNAPSHOT = app_state.to_public()
+
+
 # Cached Cloudflare records: name -> record dict
 cached_records: Dict[str, Dict] = {}
 
+# Poked to make the background refresher reload the record cache right away
+# instead of waiting out its normal interval.
+_refresh_now = threading.Event()
+
 # ---------------------
 # Helper/infra functions
 # ---------------------
 
-def telegram_send(text: str) -> None:
-    if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID:
-        return
+def _telegram_post(text: str) -> None:
     try:
-        resp = requests.post(
+        resp = TG_SESSION.post(
             f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage",
             json={"chat_id": TELEGRAM_CHAT_ID, "text": text},
-            timeout=10,
+            timeout=HTTP_TIMEOUT,
         )
         if not resp.ok:
             logger.warning("Telegram send failed: %s - %s", resp.status_code, resp.text)
@@ -165,23 +441,74 @@ def telegram_send(text: str) -> None:
         logger.warning("Telegram send exception: %s", e)
 
 
-def cf_headers() -> Dict[str, str]:
-    return {"Authorization": f"Bearer {CLOUDFLARE_API_TOKEN}", "Content-Type": "application/json"}
+# Notifications go through a bounded queue drained by one daemon thread, so
+# Telegram latency never rides on the webhook path and bursts can't pile up
+# worker threads. On overflow we drop (alerts are best-effort).
+TG_QUEUE: "queue.Queue[str]" = queue.Queue(maxsize=256)
+
+
+def _tg_worker() -> None:
+    while True:
+        msgs = [TG_QUEUE.get()]
+        # Let a flap burst accumulate for a second, then send everything as
+        # one message — one API call instead of one per notification.
+        time.sleep(1)
+        while True:
+            try:
+                msgs.append(TG_QUEUE.get_nowait())
+            except queue.Empty:
+                break
+        _telegram_post("\n---\n".join(msgs))
+
+
+threading.Thread(target=_tg_worker, daemon=True, name="tg-worker").start()
+
+
+def telegram_send(text: str) -> None:
+    if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID:
+        return
+    try:
+        TG_QUEUE.put_nowait(text)
+    except queue.Full:
+        logger.warning("Telegram queue full; dropping notification")
+
+
+# ETag of the last full record listing; lets refreshes answer with a 304
+# and no body when nothing in the zone changed.
+_records_etag: Optional[str] = None
 
 
 def load_dns_records() -> None:
-    global cached_records
+    global cached_records, _records_etag
     page = 1
-    per_page = 100
+    per_page = 5000  # Cloudflare's max; a listing is typically one request
     found: Dict[str, Dict] = {}
+    etag: Optional[str] = None
+    total_pages = 1
     while True:
         url = f"{CLOUDFLARE_API_BASE}/dns_records?page={page}&per_page={per_page}"
-        resp = requests.get(url, headers=cf_headers(), timeout=15)
+        headers = {"If-None-Match": _records_etag} if page == 1 and _records_etag else None
+        resp = CF_SESSION.get(url, headers=headers, timeout=HTTP_TIMEOUT)
+        if resp.status_code == 304:
+            logger.info("DNS records unchanged (ETag match); keeping cache")
+            return
         resp.raise_for_status()
+        if page == 1:
+            etag = resp.headers.get("ETag")
         data = resp.json()
         for r in data.get("result", []):
             name = r.get("name")
             if not DNS_RECORD_NAMES or name in DNS_RECORD_NAMES:
+                # Precompute what update_dns needs per record: type/name/
+                # proxied never change between failovers, only content/ttl.
+                r["_url"] = f"{CLOUDFLARE_API_BASE}/dns_records/{r.get('id')}"
+                r["_payload"] = {
+                    "type": r.get("type", "A"),
+                    "name": name,
+                    "content": None,
+                    "ttl": TTL_DEFAULT,
+                    "proxied": r.get("proxied", False),
+                }
                 found[name] = r
         info = data.get("result_info") or {}
         total_pages = info.get("total_pages", 1)
@@ -189,118 +516,176 @@ def load_dns_records() -> None:
             break
         page += 1
     cached_records = found
+    # An ETag only covers the whole record set when the listing fit one page.
+    _records_etag = etag if total_pages == 1 else None
+    _mark_state_changed()
     logger.info("Cached DNS Records: %s", ", ".join(found.keys()) or "<none>")
 
 
+def _put_record(name: str, record: Dict, new_ip: str) -> bool:
+    if not record.get("id"):
+        return True
+    payload = record["_payload"]
+    payload["content"] = new_ip
+    payload["ttl"] = app_state.ttl
+    resp = CF_SESSION.put(record["_url"], json=payload, timeout=HTTP_TIMEOUT)
+    if not resp.ok:
+        logger.error("Cloudflare update failed for %s: %s - %s", name, resp.status_code, resp.text)
+        return False
+    record["content"] = new_ip
+    record["ttl"] = payload["ttl"]
+    logger.info("Updated %s → %s", name, new_ip)
+    return True
+
+
+# Cleared after the batch endpoint 404s (older API deployments) so we stop
+# probing it and go straight to per-record PUTs.
+_batch_supported = True
+
+
+def _batch_update(new_ip: str) -> bool:
+    """Apply all record changes in one POST to the batch endpoint.
+
+    Returns True only when the whole batch was accepted; any failure means
+    the caller should fall back to per-record PUTs.
+    """
+    global _batch_supported
+    records = [r for r in cached_records.values() if r.get("id")]
+    if not records:
+        return False
+    stale = [r for r in records if r.get("content") != new_ip or r.get("ttl") != app_state.ttl]
+    if len(stale) < len(records):
+        logger.info("Skipped %d unchanged records", len(records) - len(stale))
+    if not stale:
+        return True
+    patches = [{"id": r["id"], "content": new_ip, "ttl": app_state.ttl} for r in stale]
+    for start in range(0, len(patches), CF_BATCH_CHUNK):
+        chunk = patches[start:start + CF_BATCH_CHUNK]
+        try:
+            resp = CF_SESSION.post(
+                f"{CLOUDFLARE_API_BASE}/dns_records/batch",
+                json={"patches": chunk},
+                timeout=HTTP_TIMEOUT,
+            )
+        except Exception as e:
+            logger.error("Cloudflare batch update raised: %s", e)
+            return False
+        if resp.status_code == 404:
+            _batch_supported = False
+            logger.info("Batch DNS endpoint unavailable; using per-record PUTs")
+            return False
+        if not resp.ok:
+            logger.error("Cloudflare batch update failed: %s - %s", resp.status_code, resp.text)
+            return False
+    # Keep the cache's view of each record current so later calls can tell
+    # whether a write is even needed.
+    for r in stale:
+        r["content"] = new_ip
+        r["ttl"] = app_state.ttl
+    logger.info("Batch-updated %d records → %s", len(patches), new_ip)
+    return True
+
+
 def update_dns(new_ip: str) -> None:
     if not cached_records:
-        load_dns_records()
-    if not cached_records:
-        logger.error("No DNS records cached/found. Aborting DNS update.")
+        # Serve-stale discipline: never page through the zone on the update
+        # path. Poke the background refresher and let the next decision
+        # pick the records up.
+        logger.error("No DNS records cached; triggering a background refresh and skipping this update.")
+        _refresh_now.set()
         return
-    for name, record in cached_records.items():
-        record_id = record.get("id")
-        if not record_id:
-            continue
-        payload = {
-            "type": record.get("type", "A"),
-            "name": name,
-            "content": new_ip,
-            "ttl": app_state.ttl,
-            "proxied": record.get("proxied", False),
-        }
-        url = f"{CLOUDFLARE_API_BASE}/dns_records/{record_id}"
-        resp = requests.put(url, headers=cf_headers(), json=payload, timeout=15)
-        if not resp.ok:
-            logger.error("Cloudflare update failed for %s: %s - %s", name, resp.status_code, resp.text)
-        else:
-            logger.info("Updated %s → %s", name, new_ip)
+    if not (CF_USE_BATCH and _batch_supported and _batch_update(new_ip)):
+        # Per-record path: the PUTs are independent; dispatch them
+        # concurrently so the whole switch costs ~1 round-trip instead of N.
+        stale = [
+            (n, r) for n, r in cached_records.items()
+            if r.get("content") != new_ip or r.get("ttl") != app_state.ttl
+        ]
+        if len(stale) < len(cached_records):
+            logger.info("Skipped %d unchanged records", len(cached_records) - len(stale))
+        try:
+            results = list(
+                DNS_POOL.map(lambda item: _put_record(item[0], item[1], new_ip), stale)
+            )
+        except Exception as e:
+            logger.error("DNS update raised: %s — state not committed", e)
+            return
+        if not all(results):
+            logger.error("One or more DNS updates failed — state not committed")
+            return
     with state_lock:
         app_state.current_dns = new_ip
         app_state.last_switch_at = dt.datetime.utcnow().isoformat() + "Z"
-        app_state.save(STATE_FILE)
+        app_state._last_switch_epoch = time.time()
+    _mark_state_changed()
+    schedule_save()
 
 
-def _cooldown_ok(last_iso: Optional[str]) -> bool:
-    if not app_state.cooldown_seconds or not last_iso:
-        return True
-    try:
-        last = dt.datetime.fromisoformat(last_iso.replace("Z", "+00:00"))
-        return (dt.datetime.utcnow() - last.replace(tzinfo=None)).total_seconds() >= app_state.cooldown_seconds
-    except Exception:
+# The status fragment in log/alert messages only has four possible values;
+# build them once instead of re-interpolating per heartbeat.
+STATUS_STRS = {
+    (s1, s2): f"S1={'UP' if s1 else 'DOWN'}, S2={'UP' if s2 else 'DOWN'}"
+    for s1 in (True, False)
+    for s2 in (True, False)
+}
+
+
+def _cooldown_ok() -> bool:
+    # Plain float math against the cached epoch; no ISO parsing per heartbeat.
+    if not app_state.cooldown_seconds or not app_state._last_switch_epoch:
         return True
+    return time.time() - app_state._last_switch_epoch >= app_state.cooldown_seconds
 
 
 def decide_failover(source: str = "auto") -> str:
+    # Snapshot everything the messages need inside the same critical section
+    # as the decision, so concurrent webhooks can't interleave a flip between
+    # the decision and the report of it.
     with state_lock:
+        status = STATUS_STRS[(app_state.server1_up, app_state.server2_up)]
+        current = app_state.current_dns
         if app_state.freeze:
-            msg = (
-                f"🧊 Frozen. No DNS change. "
-                f"S1={'UP' if app_state.server1_up else 'DOWN'} "
-                f"S2={'UP' if app_state.server2_up else 'DOWN'} | Current: {app_state.current_dns}"
-            )
+            msg = f"🧊 Frozen. No DNS change. {status} | Current: {current}"
             logger.info(msg)
             telegram_send(msg)
             return msg
 
-        if not _cooldown_ok(app_state.last_switch_at):
-            msg = f"⏳ Cooldown active; holding DNS at {app_state.current_dns}"
+        if not _cooldown_ok():
+            msg = f"⏳ Cooldown active; holding DNS at {current}"
             logger.info(msg)
             return msg
 
-        # Update streaks for hysteresis
-        if app_state.server1_up:
-            app_state._s1_up_streak += 1
-            app_state._s1_down_streak = 0
-        else:
-            app_state._s1_down_streak += 1
-            app_state._s1_up_streak = 0
-        if app_state.server2_up:
-            app_state._s2_up_streak += 1
-            app_state._s2_down_streak = 0
-        else:
-            app_state._s2_down_streak += 1
-            app_state._s2_up_streak = 0
-
-        desired_ip = app_state.current_dns
-        choose_s1 = app_state.server1_up and (app_state.up_threshold <= 1 or app_state._s1_up_streak >= app_state.up_threshold)
-        choose_s2 = (not app_state.server1_up and app_state.server2_up and (app_state.up_threshold <= 1 or app_state._s2_up_streak >= app_state.up_threshold))
-
-        if choose_s1:
-            desired_ip = SERVER1_IP
-        elif choose_s2:
-            desired_ip = SERVER2_IP
-        else:
-            desired_ip = app_state.current_dns
-
-        changed = desired_ip != app_state.current_dns
+        desired_ip = app_state.decide()
+        changed = desired_ip != current
 
     if changed:
-        update_dns(desired_ip)
-        msg = (
-            f"🔄 DNS switched to {desired_ip} by {source}\n"
-            f"📡 S1={'UP' if app_state.server1_up else 'DOWN'}, "
-            f"S2={'UP' if app_state.server2_up else 'DOWN'}"
-        )
+        DNS_UPDATE_POOL.submit(update_dns, desired_ip)
+        msg = f"🔄 Switching DNS to {desired_ip} by {source}\n📡 {status}"
         logger.info(msg)
         telegram_send(msg)
     else:
-        msg = (
-            f"ℹ️ No DNS change. S1={'UP' if app_state.server1_up else 'DOWN'}, "
-            f"S2={'UP' if app_state.server2_up else 'DOWN'} | Current: {app_state.current_dns}"
-        )
+        msg = f"ℹ️ No DNS change. {status} | Current: {current}"
         logger.info(msg)
-        telegram_send(msg)
-        with state_lock:
-            app_state.save(STATE_FILE)
     return msg
 
 
 # -----------------
 # Flask application
 # -----------------
+class _JSONProvider(DefaultJSONProvider):
+    """Route Flask's own JSON (request parsing, jsonify) through _json_dumps/
+    _json_loads so the C decoder handles webhook bodies too."""
+
+    def dumps(self, obj, **kwargs):
+        return _json_dumps(obj).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return _json_loads(s)
+
+
 app = Flask(__name__)
 app.secret_key = SECRET_KEY
+app.json = _JSONProvider(app)
 
 # --- HTMX helpers (refresh / redirect) ---
 def hx_refresh():
@@ -311,6 +696,10 @@ def hx_redirect(url: str):
     """Tell HTMX to navigate to a full page URL."""
     return Response("", 204, {"HX-Redirect": url})
 
+def json_response(obj) -> Response:
+    """jsonify-equivalent that serializes through _json_dumps (orjson)."""
+    return Response(_json_dumps(obj), mimetype="application/json")
+
 # Template loader for base/layout
 BASE_HTML = """
 <!doctype html>
@@ -349,9 +738,9 @@ BASE_HTML = """
   <header>
     <div class=\"container row\">
       <strong>Failover UI</strong>
-      <a href=\"{{ url_for('ui_dashboard') }}\" style=\"margin-left:16px\">Dashboard</a>
-      <a href=\"{{ url_for('ui_logs') }}\" style=\"margin-left:12px\">Logs</a>
-      <a href=\"{{ url_for('ui_settings') }}\" style=\"margin-left:12px\">Settings</a>
+      <a href=\"{{ NAV_URLS.dashboard }}\" style=\"margin-left:16px\">Dashboard</a>
+      <a href=\"{{ NAV_URLS.logs }}\" style=\"margin-left:12px\">Logs</a>
+      <a href=\"{{ NAV_URLS.settings }}\" style=\"margin-left:12px\">Settings</a>
       <span style=\"margin-left:auto;font-size:12px;color:#9aa0a6\">Zone {{zone}}</span>
     </div>
   </header>
@@ -390,25 +779,25 @@ DASHBOARD_HTML = """
 
 <div class=\"card mt\">
   <div class=\"title\">Records</div>
-  <div id=\"records\" hx-get=\"{{ url_for('api_records') }}\" hx-trigger=\"load, every 10s\" hx-target=\"#records\" hx-swap=\"outerHTML\"></div>
+  <div id=\"records\" hx-get=\"{{ NAV_URLS.api_records }}\" hx-trigger=\"load, every 10s\" hx-target=\"#records\" hx-swap=\"outerHTML\"></div>
 </div>
 
 <div class=\"card mt\">
   <div class=\"row\">
-    <form method=\"post\" action=\"{{ url_for('api_switch') }}\" hx-post=\"{{ url_for('api_switch') }}\" hx-headers='{"X-CSRF-Token": "{{ csrf }}"}' hx-swap=\"none\">
+    <form method=\"post\" action=\"{{ NAV_URLS.api_switch }}\" hx-post=\"{{ NAV_URLS.api_switch }}\" hx-headers='{"X-CSRF-Token": "{{ csrf }}"}' hx-swap=\"none\">
       <input type=\"hidden\" name=\"target\" value=\"server1\"><button class=\"btn\">Switch to Server1</button>
     </form>
-    <form method=\"post\" action=\"{{ url_for('api_switch') }}\" hx-post=\"{{ url_for('api_switch') }}\" hx-headers='{"X-CSRF-Token": "{{ csrf }}"}' hx-swap=\"none\">
+    <form method=\"post\" action=\"{{ NAV_URLS.api_switch }}\" hx-post=\"{{ NAV_URLS.api_switch }}\" hx-headers='{"X-CSRF-Token": "{{ csrf }}"}' hx-swap=\"none\">
       <input type=\"hidden\" name=\"target\" value=\"server2\"><button class=\"btn\">Switch to Server2</button>
     </form>
-    <form method=\"post\" action=\"{{ url_for('api_freeze') }}\" hx-post=\"{{ url_for('api_freeze') }}\" hx-headers='{"X-CSRF-Token": "{{ csrf }}"}' hx-swap=\"none\">
+    <form method=\"post\" action=\"{{ NAV_URLS.api_freeze }}\" hx-post=\"{{ NAV_URLS.api_freeze }}\" hx-headers='{"X-CSRF-Token": "{{ csrf }}"}' hx-swap=\"none\">
       <input type=\"hidden\" name=\"enabled\" value=\"{{ 'false' if state.freeze else 'true' }}\">
       <button class=\"btn {{'danger' if not state.freeze else ''}}\">{{ 'Freeze' if not state.freeze else 'Unfreeze' }}</button>
     </form>
-    <form method=\"post\" action=\"{{ url_for('api_refresh_records') }}\" hx-post=\"{{ url_for('api_refresh_records') }}\" hx-headers='{"X-CSRF-Token": "{{ csrf }}"}' hx-swap=\"none\">
+    <form method=\"post\" action=\"{{ NAV_URLS.api_refresh_records }}\" hx-post=\"{{ NAV_URLS.api_refresh_records }}\" hx-headers='{"X-CSRF-Token": "{{ csrf }}"}' hx-swap=\"none\">
       <button class=\"btn\">Refresh Records</button>
     </form>
-    <form method=\"post\" action=\"{{ url_for('api_test_telegram') }}\" hx-post=\"{{ url_for('api_test_telegram') }}\" hx-headers='{"X-CSRF-Token": "{{ csrf }}"}' hx-swap=\"none\">
+    <form method=\"post\" action=\"{{ NAV_URLS.api_test_telegram }}\" hx-post=\"{{ NAV_URLS.api_test_telegram }}\" hx-headers='{"X-CSRF-Token": "{{ csrf }}"}' hx-swap=\"none\">
       <button class=\"btn\">Test Telegram</button>
     </form>
   </div>
@@ -450,7 +839,7 @@ LOGS_HTML = """
 </div>
 <script>
 const logbox=document.getElementById('logbox');
-const es=new EventSource('{{ url_for('api_logs_stream') }}');
+const es=new EventSource('{{ NAV_URLS.api_logs_stream }}');
 es.onmessage=(e)=>{logbox.textContent += e.data + "\\n"; logbox.scrollTop = logbox.scrollHeight;};
 </script>
 {% endblock %}
@@ -459,7 +848,7 @@ es.onmessage=(e)=>{logbox.textContent += e.data + "\\n"; logbox.scrollTop = logb
 SETTINGS_HTML = """
 {% extends 'base.html' %}
 {% block content %}
-<form class=\"card\" method=\"post\" action=\"{{ url_for('api_config_post') }}\" hx-post=\"{{ url_for('api_config_post') }}\" hx-headers='{"X-CSRF-Token":"{{ csrf }}"}' hx-swap=\"none\">
+<form class=\"card\" method=\"post\" action=\"{{ NAV_URLS.api_config }}\" hx-post=\"{{ NAV_URLS.api_config }}\" hx-headers='{"X-CSRF-Token":"{{ csrf }}"}' hx-swap=\"none\">
   <div class=\"title\">Settings</div>
   <div class=\"grid\" style=\"grid-template-columns:repeat(auto-fit,minmax(240px,1fr))\">
     <label>TTL<br><input type=\"number\" name=\"ttl\" value=\"{{state.ttl}}\"></label>
@@ -478,10 +867,10 @@ SETTINGS_HTML = """
       <div class=\"title\">Webhook secret</div>
       <code>Send header X-Webhook-Secret: ******</code>
     </div>
-    <form method=\"post\" action=\"{{ url_for('api_webhook_secret_rotate') }}\" hx-post=\"{{ url_for('api_webhook_secret_rotate') }}\" hx-headers='{"X-CSRF-Token":"{{ csrf }}"}' hx-swap=\"none\">
+    <form method=\"post\" action=\"{{ NAV_URLS.api_webhook_secret_rotate }}\" hx-post=\"{{ NAV_URLS.api_webhook_secret_rotate }}\" hx-headers='{"X-CSRF-Token":"{{ csrf }}"}' hx-swap=\"none\">
       <button class=\"btn\">Rotate Secret</button>
     </form>
-    <a class=\"btn\" href=\"{{ url_for('api_config') }}\">Download config (JSON)</a>
+    <a class=\"btn\" href=\"{{ NAV_URLS.api_config }}\">Download config (JSON)</a>
   </div>
 </div>
 {% endblock %}
@@ -511,17 +900,47 @@ def get_csrf_token():
 
 
 def check_csrf():
-    expected = session.get("csrf")
-    provided = request.headers.get("X-CSRF-Token") or request.form.get("csrf")
-    if expected and provided and secrets.compare_digest(expected, provided):
-        return True
-    abort(400, "CSRF token missing or invalid")
+    expected = session.get("csrf") or ""
+    provided = request.headers.get("X-CSRF-Token") or request.form.get("csrf") or ""
+    if not expected:
+        # No token issued for this session; burn a comparison against a
+        # random sentinel so this path is timing-identical to a mismatch.
+        secrets.compare_digest(secrets.token_hex(16).encode(), provided.encode())
+        abort(400, "CSRF token missing or invalid")
+    if not secrets.compare_digest(expected.encode(), provided.encode()):
+        abort(400, "CSRF token missing or invalid")
+    return True
 
 # Register templates so {% extends 'base.html' %} works
 app.jinja_loader = DictLoader({
     'base.html': BASE_HTML,
 })
 
+# Routes are fixed at import time, so bake their paths in as template globals
+# instead of walking the url_map via url_for() on every render.
+app.jinja_env.globals["NAV_URLS"] = {
+    "dashboard": "/",
+    "logs": "/logs",
+    "settings": "/settings",
+    "api_records": "/api/records",
+    "api_switch": "/api/switch",
+    "api_freeze": "/api/freeze",
+    "api_refresh_records": "/api/refresh-records",
+    "api_test_telegram": "/api/test-telegram",
+    "api_logs_stream": "/api/logs/stream",
+    "api_config": "/api/config",
+    "api_webhook_secret_rotate": "/api/webhook-secret/rotate",
+}
+
+# Compile each page template once at import; render_template_string would
+# re-lex and re-compile the source on every request.
+app.jinja_env.auto_reload = False
+app.config["TEMPLATES_AUTO_RELOAD"] = False
+_DASH_TPL = app.jinja_env.from_string(DASHBOARD_HTML)
+_RECORDS_TPL = app.jinja_env.from_string(RECORDS_PARTIAL)
+_LOGS_TPL = app.jinja_env.from_string(LOGS_HTML)
+_SETTINGS_TPL = app.jinja_env.from_string(SETTINGS_HTML)
+
 # -------------
 # UI routes
 # -------------
@@ -529,9 +948,8 @@ app.jinja_loader = DictLoader({
 @requires_auth
 def ui_dashboard():
     csrf = get_csrf_token()
-    return render_template_string(
-        DASHBOARD_HTML,
-        state=app_state,
+    return _DASH_TPL.render(
+        state=CURRENT_SNAPSHOT,
         SERVER1_IP=SERVER1_IP,
         SERVER2_IP=SERVER2_IP,
         csrf=csrf,
@@ -542,33 +960,45 @@ def ui_dashboard():
 @app.route("/logs")
 @requires_auth
 def ui_logs():
-    return render_template_string(LOGS_HTML, zone=CLOUDFLARE_ZONE_ID)
+    return _LOGS_TPL.render(zone=CLOUDFLARE_ZONE_ID)
 
 
 @app.route("/settings")
 @requires_auth
 def ui_settings():
     csrf = get_csrf_token()
-    return render_template_string(SETTINGS_HTML, state=app_state, csrf=csrf, zone=CLOUDFLARE_ZONE_ID)
+    return _SETTINGS_TPL.render(state=CURRENT_SNAPSHOT, csrf=csrf, zone=CLOUDFLARE_ZONE_ID)
 
 
 # -------------
 # API routes
 # -------------
+# /api/status is polled by dashboards; serve pre-serialized bytes and only
+# rebuild when the state generation moved.
+_status_cache: Optional[bytes] = None
+_status_cache_gen = -1
+
+
 @app.get("/api/status")
 @requires_auth
 def api_status():
-    return jsonify({
-        "state": app_state.to_public(),
-        "records": {k: {"type": v.get("type"), "content": v.get("content"), "ttl": v.get("ttl"), "proxied": v.get("proxied")} for k, v in cached_records.items()}
-    })
+    global _status_cache, _status_cache_gen
+    if _status_cache is None or _status_cache_gen != _state_gen:
+        gen = _state_gen
+        _status_cache = _json_dumps({
+            "state": CURRENT_SNAPSHOT,
+            "records": {k: {"type": v.get("type"), "content": v.get("content"), "ttl": v.get("ttl"), "proxied": v.get("proxied")} for k, v in cached_records.items()}
+        })
+        _status_cache_gen = gen
+    return Response(_status_cache, mimetype="application/json")
 
 
 @app.get("/api/records")
 @requires_auth
 def api_records():
-    ns = {k: SimpleNamespace(**v) for k, v in cached_records.items()}
-    html = render_template_string(RECORDS_PARTIAL, records=ns)
+    # Jinja attribute access falls back to __getitem__, so the record dicts
+    # can be passed straight through — no per-row namespace copies.
+    html = _RECORDS_TPL.render(records=cached_records)
     return Response(html, 200, {"Content-Type": "text/html"})
 
 
@@ -627,13 +1057,14 @@ def api_freeze():
     with state_lock:
         app_state.freeze = enabled
         app_state.save(STATE_FILE)
+    _mark_state_changed()
     return hx_refresh()
 
 
 @app.get("/api/config")
 @requires_auth
 def api_config():
-    return jsonify({
+    return json_response({
         "env": {
             "CLOUDFLARE_ZONE_ID": CLOUDFLARE_ZONE_ID,
             "DNS_RECORD_NAMES": DNS_RECORD_NAMES,
@@ -663,42 +1094,48 @@ def api_config_post():
         app_state.up_threshold = max(1, _int("up_threshold", app_state.up_threshold))
         app_state.down_threshold = max(0, _int("down_threshold", app_state.down_threshold))
         app_state.save(STATE_FILE)
+    _mark_state_changed()
     return hx_redirect(url_for("ui_settings"))  # back to settings with a full load
 
 
 @app.get("/api/diagnostics")
 @requires_auth
 def api_diagnostics():
-    ok_cf = False
-    err_cf = None
-    try:
-        r = requests.get(f"{CLOUDFLARE_API_BASE}", headers=cf_headers(), timeout=10)
-        ok_cf = r.ok
-        if not ok_cf:
-            err_cf = r.text
-    except Exception as e:
-        err_cf = str(e)
+    def probe_cf():
+        try:
+            r = CF_SESSION.get(f"{CLOUDFLARE_API_BASE}", timeout=HTTP_TIMEOUT)
+            return r.ok, None if r.ok else r.text
+        except Exception as e:
+            return False, str(e)
 
-    results = []
-    for name in (DNS_RECORD_NAMES or list(cached_records.keys()))[:3]:
+    def probe_doh(name):
         try:
-            rr = requests.get(
+            rr = DOH_SESSION.get(
                 "https://cloudflare-dns.com/dns-query",
                 params={"name": name, "type": "A"},
                 headers={"accept": "application/dns-json"},
-                timeout=8,
+                timeout=HTTP_TIMEOUT,
             )
-            results.append({"name": name, "ok": rr.ok, "body": rr.json() if rr.ok else rr.text})
+            return {"name": name, "ok": rr.ok, "body": rr.json() if rr.ok else rr.text}
         except Exception as e:
-            results.append({"name": name, "ok": False, "error": str(e)})
+            return {"name": name, "ok": False, "error": str(e)}
 
-    return jsonify({"cloudflare_api_ok": ok_cf, "cloudflare_error": err_cf, "dns_checks": results})
+    # The probes are independent I/O; run them concurrently so wall time is
+    # the slowest probe, not the sum of all of them.
+    with ThreadPoolExecutor(max_workers=4, thread_name_prefix="diag") as ex:
+        cf_fut = ex.submit(probe_cf)
+        doh_futs = [ex.submit(probe_doh, n)
+                    for n in (DNS_RECORD_NAMES or list(cached_records.keys()))[:3]]
+        ok_cf, err_cf = cf_fut.result()
+        results = [f.result() for f in doh_futs]
+
+    return json_response({"cloudflare_api_ok": ok_cf, "cloudflare_error": err_cf, "dns_checks": results})
 
 
 @app.get("/api/webhook-secret")
 @requires_auth
 def api_webhook_secret_get():
-    return jsonify({"webhook_secret": "***"})
+    return json_response({"webhook_secret": "***"})
 
 
 @app.post("/api/webhook-secret/rotate")
@@ -708,6 +1145,7 @@ def api_webhook_secret_rotate():
     with state_lock:
         app_state.webhook_secret = secrets.token_urlsafe(24)
         app_state.save(STATE_FILE)
+    _mark_state_changed()
     return hx_redirect(url_for("ui_settings"))
 
 
@@ -716,14 +1154,35 @@ def api_webhook_secret_rotate():
 def api_logs():
     limit = int(request.args.get("limit", 200))
     out = tail_log(limit)
-    return jsonify({"lines": out})
+    return json_response({"lines": out})
+
+
+# Last tail_log answer, keyed on (mtime, size, n) so repeated polls against
+# an unchanged file return without touching the disk.
+_tail_memo: Dict = {}
 
 
 def tail_log(n: int) -> List[str]:
     try:
-        with open(LOG_FILE, "r", encoding="utf-8", errors="ignore") as f:
-            lines = f.readlines()
-        return [l.rstrip("\n") for l in lines[-n:]]
+        size = os.path.getsize(LOG_FILE)
+        key = (os.path.getmtime(LOG_FILE), size, n)
+        if _tail_memo.get("key") == key:
+            return _tail_memo["lines"]
+        # Read backwards in growing blocks until we have n newlines, so a
+        # multi-MB log costs O(n × line length) instead of a full read.
+        block = 8192
+        with open(LOG_FILE, "rb") as f:
+            while True:
+                start = max(0, size - block)
+                f.seek(start)
+                data = f.read(size - start)
+                if start == 0 or data.count(b"\n") > n:
+                    break
+                block *= 2
+        lines = data.decode("utf-8", errors="ignore").splitlines()[-n:]
+        _tail_memo["key"] = key
+        _tail_memo["lines"] = lines
+        return lines
     except Exception:
         return []
 
@@ -732,85 +1191,173 @@ def tail_log(n: int) -> List[str]:
 @requires_auth
 def api_logs_stream():
     def gen():
-        last_size = 0
-        while True:
-            try:
-                with open(LOG_FILE, "r", encoding="utf-8", errors="ignore") as f:
-                    f.seek(last_size)
-                    chunk = f.read()
-                    last_size = f.tell()
-                for line in chunk.splitlines():
-                    yield f"data: {line}\n\n"
-            except Exception:
-                pass
-            time.sleep(1)
+        q = _sse_handler.subscribe()
+        try:
+            # Seed with recent history, then block on the queue — new lines
+            # are pushed by the logging fan-out with no polling.
+            for line in tail_log(50):
+                yield f"data: {line}\n\n"
+            while True:
+                yield f"data: {q.get()}\n\n"
+        finally:
+            _sse_handler.unsubscribe(q)
     return Response(gen(), mimetype="text/event-stream")
 
 
+# Pre-rendered /metrics body; rebuilt only when the state generation moves,
+# so steady-state Prometheus scrapes return cached bytes.
+_metrics_cache: Optional[bytes] = None
+_metrics_cache_gen = -1
+
+
 @app.get("/metrics")
 def metrics():
-    lines = []
-    lines.append("failover_current_active 1" if app_state.current_dns == SERVER1_IP else "failover_current_active 2")
-    lines.append(f"failover_server1_up {1 if app_state.server1_up else 0}")
-    lines.append(f"failover_server2_up {1 if app_state.server2_up else 0}")
-    lines.append(f"failover_frozen {1 if app_state.freeze else 0}")
-    if app_state.last_switch_at:
-        try:
-            last = dt.datetime.fromisoformat(app_state.last_switch_at.replace("Z", "+00:00")).timestamp()
-            lines.append(f"failover_last_switch {last}")
-        except Exception:
-            pass
-    return Response("\n".join(lines) + "\n", mimetype="text/plain")
+    global _metrics_cache, _metrics_cache_gen
+    if _metrics_cache is None or _metrics_cache_gen != _state_gen:
+        gen = _state_gen
+        snap = CURRENT_SNAPSHOT  # lock-free coherent view
+        lines = []
+        lines.append("failover_current_active 1" if snap["current_dns"] == SERVER1_IP else "failover_current_active 2")
+        lines.append(f"failover_server1_up {1 if snap['server1_up'] else 0}")
+        lines.append(f"failover_server2_up {1 if snap['server2_up'] else 0}")
+        lines.append(f"failover_frozen {1 if snap['freeze'] else 0}")
+        if snap["last_switch_at"]:
+            try:
+                last = dt.datetime.fromisoformat(snap["last_switch_at"].replace("Z", "+00:00")).timestamp()
+                lines.append(f"failover_last_switch {last}")
+            except Exception:
+                pass
+        _metrics_cache = ("\n".join(lines) + "\n").encode("utf-8")
+        _metrics_cache_gen = gen
+    return Response(_metrics_cache, mimetype="text/plain")
 
 
 @app.get("/healthz")
 def healthz():
-    return jsonify({"ok": True})
+    return json_response({"ok": True})
 
 # -----------------
 # Webhook endpoints
 # -----------------
 
-def _parse_status(body: dict) -> bool:
+_EMPTY: Dict = {}
+
+
+def _parse_status(raw: bytes) -> Optional[bool]:
+    """Extract heartbeat.status straight from the raw webhook body.
+
+    Returns None when the body is empty or not the expected shape, so the
+    caller can 400 instead of treating garbage as a DOWN heartbeat.
+    """
+    if not raw:
+        return None
     try:
-        return int(body.get("heartbeat", {}).get("status", 0)) == 1
+        d = _json_loads(raw)
     except Exception:
-        return False
+        return None
+    if not isinstance(d, dict):
+        return None
+    hb = d.get("heartbeat", _EMPTY)
+    if not isinstance(hb, dict):
+        return None
+    return hb.get("status") == 1
 
 
 def _check_webhook_secret():
-    secret = request.headers.get("X-Webhook-Secret")
-    if not secret or not app_state.webhook_secret or not secrets.compare_digest(secret, app_state.webhook_secret):
+    provided = request.headers.get("X-Webhook-Secret") or ""
+    expected = app_state.webhook_secret or ""
+    if not expected:
+        # Same constant-time discipline as check_csrf: always pay one
+        # comparison so a missing secret isn't distinguishable by timing.
+        secrets.compare_digest(secrets.token_urlsafe(24).encode(), provided.encode())
+        abort(401, "Invalid webhook secret")
+    if not secrets.compare_digest(expected.encode(), provided.encode()):
         abort(401, "Invalid webhook secret")
 
 
+def _settled_locked() -> bool:
+    """True if current_dns already points where the decision engine would.
+
+    Caller must hold state_lock. Both-down holds the last DNS, so that
+    counts as settled too.
+    """
+    if app_state.server1_up:
+        return app_state.current_dns == SERVER1_IP
+    if app_state.server2_up:
+        return app_state.current_dns == SERVER2_IP
+    return True
+
+
 @app.post("/webhook/server1")
 def webhook_server1():
     _check_webhook_secret()
-    is_up = _parse_status(request.json or {})
+    is_up = _parse_status(request.get_data(cache=False))
+    if is_up is None:
+        return json_response({"error": "empty or invalid JSON body"}), 400
     with state_lock:
+        unchanged = app_state.server1_up == is_up
         app_state.server1_up = is_up
+        settled = unchanged and _settled_locked()
+    if not unchanged:
+        _mark_state_changed()
+    if settled:
+        # Steady-state heartbeat: nothing to decide, log, or notify.
+        return json_response({"message": "Server1 status unchanged", "server1Status": is_up, "server2Status": app_state.server2_up})
     msg = decide_failover(source="webhook:s1")
-    return jsonify({"message": "Server1 status updated", "server1Status": is_up, "server2Status": app_state.server2_up, "info": msg})
+    return json_response({"message": "Server1 status updated", "server1Status": is_up, "server2Status": app_state.server2_up, "info": msg})
 
 
 @app.post("/webhook/server2")
 def webhook_server2():
     _check_webhook_secret()
-    is_up = _parse_status(request.json or {})
+    is_up = _parse_status(request.get_data(cache=False))
+    if is_up is None:
+        return json_response({"error": "empty or invalid JSON body"}), 400
     with state_lock:
+        unchanged = app_state.server2_up == is_up
         app_state.server2_up = is_up
+        settled = unchanged and _settled_locked()
+    if not unchanged:
+        _mark_state_changed()
+    if settled:
+        return json_response({"message": "Server2 status unchanged", "server1Status": app_state.server1_up, "server2Status": is_up})
     msg = decide_failover(source="webhook:s2")
-    return jsonify({"message": "Server2 status updated", "server1Status": app_state.server1_up, "server2Status": is_up, "info": msg})
+    return json_response({"message": "Server2 status updated", "server1Status": app_state.server1_up, "server2Status": is_up, "info": msg})
 
 
 # --------------
 # Initialize cache
 # --------------
+
+def _records_refresh_loop() -> None:
+    """Keep cached_records fresh so renames/additions in the zone are picked
+    up without a restart. Failures back off exponentially (capped at the
+    normal interval) instead of killing the refresher."""
+    failures = 0
+    while True:
+        delay = CF_REFRESH_SEC if failures == 0 else min(30 * (2 ** (failures - 1)), CF_REFRESH_SEC)
+        _refresh_now.wait(timeout=delay)
+        _refresh_now.clear()
+        try:
+            load_dns_records()
+            failures = 0
+        except Exception as e:
+            failures += 1
+            logger.warning("Background record refresh failed (%d in a row): %s", failures, e)
+
+
 load_dns_records()
+threading.Thread(target=_records_refresh_loop, daemon=True, name="cf-refresh").start()
 
 # --------------
-# Run dev server
+# Run server
 # --------------
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=PORT)
+    if _HAS_GEVENT:
+        from gevent.pywsgi import WSGIServer
+
+        logger.info("Serving on 0.0.0.0:%s (gevent)", PORT)
+        WSGIServer(("0.0.0.0", PORT), app).serve_forever()
+    else:
+        logger.warning("gevent not installed; falling back to the Flask dev server")
+        app.run(host="0.0.0.0", port=PORT, threaded=True)